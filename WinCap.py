@@ -6,12 +6,15 @@ import threading
 import platform
 import subprocess
 from pathlib import Path
-from PIL import ImageGrab, Image
+from PIL import ImageGrab, Image, ImageChops
 import keyboard
 import json
+import argparse
 from typing import List, Optional, Tuple, Dict, Any
 import logging
 
+from command_index import CommandIndex
+
 # Platform-specific imports
 if platform.system() == "Windows":
     from pywinauto import Desktop
@@ -62,10 +65,23 @@ class CrossPlatformWindowManager:
                         not w.window_text().strip().startswith('Program Manager')):
                         
                         rect = w.rectangle()
+                        try:
+                            client = w.client_area_rect()
+                            client_rect = (client.left, client.top, client.right, client.bottom)
+                        except Exception:
+                            client_rect = (rect.left, rect.top, rect.right, rect.bottom)
+                        
+                        try:
+                            wm_class = w.class_name()
+                        except Exception:
+                            wm_class = None
+                        
                         windows.append({
                             'title': w.window_text().strip(),
                             'handle': w.handle,
                             'rect': (rect.left, rect.top, rect.right, rect.bottom),
+                            'client_rect': client_rect,
+                            'wm_class': wm_class,
                             'width': rect.width(),
                             'height': rect.height(),
                             'platform_obj': w
@@ -120,6 +136,13 @@ class CrossPlatformWindowManager:
                     if not title.strip():
                         continue
                     
+                    # WM_CLASS is (instance, class); the class stays put while the title changes
+                    try:
+                        class_prop = window.get_wm_class()
+                        wm_class = class_prop[1] if class_prop else None
+                    except Exception:
+                        wm_class = None
+                    
                     # Get absolute position with better coordinate calculation
                     try:
                         translated = window.translate_coords(self.root, 0, 0)
@@ -131,6 +154,9 @@ class CrossPlatformWindowManager:
                         if y < 0:
                             y = 0
                         
+                        # Client area excludes the decorations added back below
+                        client_rect = (x, y, x + geom.width, y + geom.height)
+                        
                         # Get frame extents to account for window decorations
                         try:
                             frame_prop = window.get_full_property(
@@ -155,6 +181,7 @@ class CrossPlatformWindowManager:
                         logging.debug(f"Coordinate calculation failed for window {window_id}: {e}")
                         x, y = geom.x, geom.y
                         width, height = geom.width, geom.height
+                        client_rect = (x, y, x + width, y + height)
                     
                     # Ensure coordinates are reasonable
                     if x < 0 or y < 0 or width <= 0 or height <= 0:
@@ -164,6 +191,8 @@ class CrossPlatformWindowManager:
                         'title': title.strip(),
                         'handle': window_id,
                         'rect': (x, y, x + width, y + height),
+                        'client_rect': client_rect,
+                        'wm_class': wm_class,
                         'width': width,
                         'height': height,
                         'platform_obj': window,
@@ -278,11 +307,19 @@ class CrossPlatformWindowManager:
         return None
 
 class WindowMonitor:
+    # Capture region modes: whole window, client area, fixed rect, learned content area
+    ROI_MODES = ('full', 'client', 'manual', 'auto')
+    ROI_LEARN_FRAMES = 4
+    ROI_RECHECK_FRAMES = 10
+    ROI_MARGIN = 8
+    ROI_DIFF_THRESHOLD = 16
+    
     def __init__(self):
         self.SAVE_DIR = Path("screenshots")
         self.GIF_DIR = Path("gifs")
         self.LOG_FILE = Path("command_log.txt")
         self.CONFIG_FILE = Path("config.json")
+        self.INDEX_FILE = Path("command_index.db")
         
         # Create directories
         self.SAVE_DIR.mkdir(exist_ok=True)
@@ -306,13 +343,25 @@ class WindowMonitor:
             self.logger.error(f"Failed to initialize window manager: {e}")
             sys.exit(1)
         
+        # Searchable index of commands, screenshots and GIFs
+        try:
+            self.index = CommandIndex(self.INDEX_FILE)
+        except Exception as e:
+            self.logger.warning(f"Command index disabled: {e}")
+            self.index = None
+        
         # State variables
         self.typed_buffer = []
         self.selected_window = None
         self.target_rect = None
+        self.capture_rect = None
+        self.roi_settings = {}
+        self.roi_auto = None
         self.selected_handle = None
         self.awaiting_next_command = False
+        self.current_command_id = None
         self.saved_screenshots = []
+        self.saved_rects = []
         self.gif_frame_count = 10
         self.is_monitoring = False
         self.screenshot_lock = threading.Lock()
@@ -331,15 +380,39 @@ class WindowMonitor:
                 with open(self.CONFIG_FILE, 'r') as f:
                     config = json.load(f)
                     self.gif_frame_count = config.get('gif_frame_count', 10)
+                    self.roi_settings = self._validate_roi_settings(config.get('roi', {}))
                     self.logger.info(f"Loaded config: GIF frame count = {self.gif_frame_count}")
         except Exception as e:
             self.logger.warning(f"Could not load config: {e}")
     
+    def _validate_roi_settings(self, roi: Any) -> Dict[str, Dict[str, Any]]:
+        """Keep only well-formed per-window capture region entries from the config."""
+        if not isinstance(roi, dict):
+            self.logger.warning(f"Ignoring invalid 'roi' config: {roi!r}")
+            return {}
+        
+        valid = {}
+        for title, entry in roi.items():
+            mode = entry.get('mode') if isinstance(entry, dict) else None
+            rect = entry.get('rect') if isinstance(entry, dict) else None
+            if mode == 'manual':
+                ok = (isinstance(rect, list) and len(rect) == 4 and
+                      all(isinstance(v, int) and not isinstance(v, bool) for v in rect) and
+                      0 <= rect[0] < rect[2] and 0 <= rect[1] < rect[3])
+            else:
+                ok = mode in self.ROI_MODES
+            if ok:
+                valid[title] = entry
+            else:
+                self.logger.warning(f"Ignoring invalid capture region for '{title}': {entry!r}, using full window")
+        return valid
+    
     def save_config(self):
         """Save current configuration to file."""
         try:
             config = {
                 'gif_frame_count': self.gif_frame_count,
+                'roi': self.roi_settings,
                 'platform': self.platform,
                 'last_updated': datetime.datetime.now().isoformat()
             }
@@ -377,6 +450,7 @@ class WindowMonitor:
                     self.selected_window = windows[idx]
                     self.target_rect = self.selected_window['rect']
                     self.selected_handle = self.selected_window['handle']
+                    self.apply_roi()
                     
                     print(f"\n✓ Selected: {self.selected_window['title']}")
                     print(f"  Size: {self.selected_window['width']}x{self.selected_window['height']}")
@@ -391,18 +465,107 @@ class WindowMonitor:
                 self.logger.error(f"Error selecting window: {e}")
                 print("An error occurred. Please try again.")
     
-    def take_screenshot(self, tag: str = "") -> Optional[str]:
+    def _clamp_to_window(self, rect: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """Clamp an absolute rect to the selected window, falling back to the whole window."""
+        wx1, wy1, wx2, wy2 = self.target_rect
+        x1, y1, x2, y2 = rect
+        x1, y1 = max(wx1, x1), max(wy1, y1)
+        x2, y2 = min(wx2, x2), min(wy2, y2)
+        if x2 <= x1 or y2 <= y1:
+            self.logger.warning(f"Capture region {rect} is outside the window, using full window")
+            return self.target_rect
+        return (x1, y1, x2, y2)
+    
+    def _roi_key(self) -> str:
+        """Config key for the selected window: its window class if known, else its title."""
+        wm_class = self.selected_window.get('wm_class')
+        return f"class:{wm_class}" if wm_class else self.selected_window['title']
+    
+    def _roi_for_window(self) -> Dict[str, Any]:
+        """Capture region settings for the selected window; an exact title entry wins."""
+        return (self.roi_settings.get(self.selected_window['title']) or
+                self.roi_settings.get(self._roi_key()) or {})
+    
+    def apply_roi(self):
+        """Resolve the selected window's capture region into an absolute rect."""
+        settings = self._roi_for_window()
+        mode = settings.get('mode', 'full')
+        self.roi_auto = None
+        
+        if mode == 'client':
+            self.capture_rect = self._clamp_to_window(
+                self.selected_window.get('client_rect', self.target_rect)
+            )
+        elif mode == 'manual' and len(settings.get('rect', [])) == 4:
+            # Manual rects are stored relative to the window's top-left corner
+            left, top, right, bottom = settings['rect']
+            wx, wy = self.target_rect[0], self.target_rect[1]
+            self.capture_rect = self._clamp_to_window((wx + left, wy + top, wx + right, wy + bottom))
+        elif mode == 'auto':
+            # Capture the whole window until the changing area has been learned
+            self.capture_rect = self.target_rect
+            self.roi_auto = {'learning': True, 'frames': 0, 'since_check': 0, 'previous': None, 'top': None}
+        else:
+            self.capture_rect = self.target_rect
+        
+        self.logger.info(f"Capture region ({mode}): {self.capture_rect}")
+    
+    def _next_capture_rect(self) -> Tuple[int, int, int, int]:
+        """Rect for the next screenshot; auto mode periodically grabs the whole window again."""
+        auto = self.roi_auto
+        if auto is None:
+            return self.capture_rect
+        if auto['learning'] or auto['since_check'] >= self.ROI_RECHECK_FRAMES:
+            return self.target_rect
+        auto['since_check'] += 1
+        return self.capture_rect
+    
+    def _update_auto_roi(self, img: Image.Image):
+        """Accumulate changed rows from a full-window frame and move the region's top edge up to them."""
+        auto = self.roi_auto
+        previous = auto['previous']
+        auto['previous'] = img.convert('L')
+        auto['since_check'] = 0
+        
+        old_top = auto['top']
+        learning = auto['learning']
+        if previous is not None and previous.size == auto['previous'].size:
+            diff = ImageChops.difference(previous, auto['previous'])
+            bbox = diff.point(lambda p: 255 if p > self.ROI_DIFF_THRESHOLD else 0).getbbox()
+            if bbox and (old_top is None or bbox[1] < old_top):
+                auto['top'] = bbox[1]
+        
+        if learning:
+            auto['frames'] += 1
+            # Keep learning until something has actually changed
+            if auto['frames'] < self.ROI_LEARN_FRAMES or auto['top'] is None:
+                return
+            auto['learning'] = False
+        elif auto['top'] == old_top:
+            return
+        
+        # Output can be as wide as the client area and new lines appear further down,
+        # so the region keeps the full client width and bottom; only its top edge is learned.
+        # top is relative to the window, as the frame was the whole target_rect
+        cx1, cy1, cx2, cy2 = self._clamp_to_window(self.selected_window.get('client_rect', self.target_rect))
+        top = self.target_rect[1] + auto['top'] - self.ROI_MARGIN
+        self.capture_rect = self._clamp_to_window((cx1, max(cy1, top), cx2, cy2))
+        self.logger.info(f"{'Learned' if learning else 'Grew'} capture region: {self.capture_rect}")
+    
+    def take_screenshot(self, tag: str = "", command_id: Optional[int] = None) -> Optional[str]:
         """Take screenshot with enhanced Linux support and debugging."""
         try:
             with self.screenshot_lock:
-                if not self.target_rect:
+                if not self.capture_rect:
                     return None
                 
+                rect = self._next_capture_rect()
+                
                 # Debug information for Linux
                 if self.platform == "Linux":
-                    self.logger.debug(f"Attempting screenshot with rect: {self.target_rect}")
+                    self.logger.debug(f"Attempting screenshot with rect: {rect}")
                 
-                img = self.wm.take_window_screenshot(self.target_rect)
+                img = self.wm.take_window_screenshot(rect)
                 if not img:
                     self.logger.error("Screenshot returned None")
                     return None
@@ -412,6 +575,9 @@ class WindowMonitor:
                     self.logger.error(f"Invalid image size: {img.size}")
                     return None
                 
+                if self.roi_auto is not None and rect == self.target_rect:
+                    self._update_auto_roi(img)
+                
                 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
                 filename = self.SAVE_DIR / f"{timestamp}{tag}.png"
                 
@@ -421,18 +587,25 @@ class WindowMonitor:
                 
                 img.save(filename, optimize=True, quality=85)
                 self.saved_screenshots.append(str(filename))
+                self.saved_rects.append(rect)
+                
+                if self.index:
+                    # Output frames are linked to the command they were scheduled for
+                    self.index.add_frame(str(filename), tag, command_id)
                 
                 self.logger.info(f"Screenshot saved: {filename.name} (size: {img.size})")
                 
                 # Clean up old screenshots
                 if len(self.saved_screenshots) > self.gif_frame_count * 3:
                     self.saved_screenshots = self.saved_screenshots[-self.gif_frame_count * 2:]
+                    self.saved_rects = self.saved_rects[-self.gif_frame_count * 2:]
                 
                 # Create GIF if we have enough frames
                 if len(self.saved_screenshots) >= self.gif_frame_count:
                     threading.Thread(
                         target=self.make_gif, 
-                        args=(self.saved_screenshots[-self.gif_frame_count:],),
+                        args=(self.saved_screenshots[-self.gif_frame_count:],
+                              self.saved_rects[-self.gif_frame_count:]),
                         daemon=True
                     ).start()
                 
@@ -444,21 +617,36 @@ class WindowMonitor:
             self.logger.debug(f"Screenshot error traceback: {traceback.format_exc()}")
             return None
     
-    def make_gif(self, frame_paths: List[str]):
-        """Create GIF with optimization."""
+    def make_gif(self, frame_paths: List[str],
+                 frame_rects: Optional[List[Tuple[int, int, int, int]]] = None):
+        """Create GIF with optimization, cropping every frame to the latest capture region."""
         try:
             if not frame_paths:
                 return
             
+            target = frame_rects[-1] if frame_rects else None
             frames = []
-            for path in frame_paths:
+            used_paths = []
+            for i, path in enumerate(frame_paths):
                 try:
                     if os.path.exists(path):
                         img = Image.open(path)
+                        rect = frame_rects[i] if frame_rects else None
+                        if target and rect != target:
+                            # e.g. full-window frames taken while an auto region was learned
+                            if not (rect[0] <= target[0] and rect[1] <= target[1] and
+                                    rect[2] >= target[2] and rect[3] >= target[3]):
+                                self.logger.debug(f"Skipping frame {path}: {rect} does not cover {target}")
+                                continue
+                            img = img.crop((
+                                target[0] - rect[0], target[1] - rect[1],
+                                target[2] - rect[0], target[3] - rect[1]
+                            ))
                         # Resize if too large
                         if img.width > 800 or img.height > 600:
                             img.thumbnail((800, 600), Image.Resampling.LANCZOS)
                         frames.append(img.convert("RGB"))
+                        used_paths.append(path)
                 except Exception as e:
                     self.logger.warning(f"Could not load frame {path}: {e}")
             
@@ -477,25 +665,35 @@ class WindowMonitor:
                 optimize=True
             )
             
+            if self.index:
+                self.index.add_gif(str(gif_path), used_paths)
+            
             size_mb = gif_path.stat().st_size / (1024 * 1024)
             self.logger.info(f"🎞️  GIF created: {gif_name} ({size_mb:.1f}MB)")
             
         except Exception as e:
             self.logger.error(f"Error creating GIF: {e}")
     
-    def log_command(self, command: str):
-        """Log command with timestamp."""
+    def log_command(self, command: str) -> Optional[int]:
+        """Log command with timestamp and return its index id."""
+        command_id = None
         try:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            now = datetime.datetime.now()
+            timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
             log_entry = f"[{timestamp}] {command}\n"
             
             with open(self.LOG_FILE, "a", encoding="utf-8") as f:
                 f.write(log_entry)
                 
+            if self.index:
+                window = self.selected_window['title'] if self.selected_window else None
+                command_id = self.index.add_command(command, window, now.timestamp())
+                
             self.logger.info(f"Command logged: {command}")
             
         except Exception as e:
             self.logger.error(f"Error logging command: {e}")
+        return command_id
     
     def on_key(self, event):
         """Cross-platform key event handler."""
@@ -510,11 +708,10 @@ class WindowMonitor:
             
             if event.name == 'enter':
                 command = ''.join(self.typed_buffer).strip()
-                if command:
-                    self.log_command(command)
+                self.current_command_id = self.log_command(command) if command else None
                 
                 self.typed_buffer = []
-                self.take_screenshot("_before_output")
+                self.take_screenshot("_before_output", command_id=self.current_command_id)
                 self.awaiting_next_command = True
             
             elif event.name == 'backspace':
@@ -524,13 +721,15 @@ class WindowMonitor:
             elif event.name == 'space':
                 self.typed_buffer.append(' ')
                 if self.awaiting_next_command:
-                    threading.Timer(0.5, lambda: self.take_screenshot("_after_output")).start()
+                    command_id = self.current_command_id
+                    threading.Timer(0.5, lambda: self.take_screenshot("_after_output", command_id=command_id)).start()
                     self.awaiting_next_command = False
             
             elif len(event.name) == 1 and event.name.isprintable():
                 self.typed_buffer.append(event.name)
                 if self.awaiting_next_command:
-                    threading.Timer(0.5, lambda: self.take_screenshot("_after_output")).start()
+                    command_id = self.current_command_id
+                    threading.Timer(0.5, lambda: self.take_screenshot("_after_output", command_id=command_id)).start()
                     self.awaiting_next_command = False
             
         except Exception as e:
@@ -557,9 +756,57 @@ class WindowMonitor:
             except ValueError:
                 print("Please enter a valid number.")
         
+        if self.selected_window:
+            self.configure_roi()
+        
         self.save_config()
         print(f"✓ Configuration saved. GIF will be created every {self.gif_frame_count} screenshots.")
     
+    def configure_roi(self):
+        """Interactive capture region setup for the selected window."""
+        settings = self._roi_for_window() or {'mode': 'full'}
+        
+        while True:
+            user_input = input(
+                f"Capture region [{'/'.join(self.ROI_MODES)}] (current: {settings['mode']}): "
+            ).strip().lower()
+            if not user_input:
+                break
+            if user_input not in self.ROI_MODES:
+                print(f"Please enter one of: {', '.join(self.ROI_MODES)}.")
+                continue
+            
+            if user_input != 'manual':
+                settings = {'mode': user_input}
+                break
+            
+            rect = None
+            width, height = self.selected_window['width'], self.selected_window['height']
+            while True:
+                try:
+                    rect_input = input(
+                        f"Region as left,top,right,bottom within the {width}x{height} window "
+                        f"(blank to go back): "
+                    ).strip()
+                    if not rect_input:
+                        break
+                    left, top, right, bottom = (int(v) for v in rect_input.split(','))
+                    if 0 <= left < right <= width and 0 <= top < bottom <= height:
+                        rect = [left, top, right, bottom]
+                        break
+                    print("Region must lie inside the window.")
+                except ValueError:
+                    print("Please enter four comma-separated numbers.")
+            
+            if rect:
+                settings = {'mode': 'manual', 'rect': rect}
+                break
+        
+        # Terminal titles change with the directory and command; save under the stable key
+        self.roi_settings.pop(self.selected_window['title'], None)
+        self.roi_settings[self._roi_key()] = settings
+        self.apply_roi()
+    
     def display_status(self):
         """Display current monitoring status."""
         print(f"\n{'='*70}")
@@ -569,6 +816,12 @@ class WindowMonitor:
         print(f"Target Window: {self.selected_window['title'] if self.selected_window else 'None'}")
         print(f"Screenshots Taken: {len(self.saved_screenshots)}")
         print(f"GIF Frame Count: {self.gif_frame_count}")
+        if self.roi_auto and self.roi_auto['learning']:
+            print(f"Capture Region: {self.capture_rect} (auto, learning)")
+        elif self.roi_auto:
+            print(f"Capture Region: {self.capture_rect} (auto, whole window rechecked every {self.ROI_RECHECK_FRAMES} screenshots)")
+        else:
+            print(f"Capture Region: {self.capture_rect}")
         print(f"Monitoring: {'Active' if self.is_monitoring else 'Inactive'}")
         print(f"{'='*70}")
         print("Commands:")
@@ -693,7 +946,59 @@ class WindowMonitor:
             print(f"📁 Screenshots saved in: {self.SAVE_DIR.absolute()}")
             print(f"🎞️  GIFs saved in: {self.GIF_DIR.absolute()}")
             print(f"📝 Commands logged in: {self.LOG_FILE.absolute()}")
+            print(f"🔎 Command index: {self.INDEX_FILE.absolute()}")
+
+def parse_time(value: str) -> float:
+    """Parse an ISO date/time argument into a Unix timestamp."""
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date/time: {value!r} (use YYYY-MM-DD[ HH:MM[:SS]])")
+
+def search_main(argv: List[str]):
+    """Query the command index from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="WinCap.py search",
+        description="Search logged commands and their screenshots/GIFs"
+    )
+    parser.add_argument("text", nargs="*", help="words that must appear in the command")
+    parser.add_argument("-p", "--prefix", help="command starts with this text")
+    parser.add_argument("--since", type=parse_time, help="only commands at or after this time")
+    parser.add_argument("--until", type=parse_time, help="only commands before this time")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="maximum results (default: 20)")
+    parser.add_argument("--db", type=Path, default=Path("command_index.db"), help="index file")
+    args = parser.parse_args(argv)
+    if args.limit < 1:
+        parser.error("--limit must be at least 1")
+
+    if not args.db.exists():
+        print(f"No command index found at {args.db}")
+        sys.exit(1)
+
+    index = CommandIndex(args.db)
+    start = time.perf_counter()
+    results = index.search(
+        text=" ".join(args.text),
+        prefix=args.prefix,
+        since=args.since,
+        until=args.until,
+        limit=args.limit
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    index.close()
+
+    for r in results:
+        timestamp = datetime.datetime.fromtimestamp(r['ts']).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] {r['command']}")
+        for frame in r['frames']:
+            print(f"    📸 {frame['path']}")
+        for gif in r['gifs']:
+            print(f"    🎞️  {gif}")
+    print(f"\n{len(results)} result(s) in {elapsed_ms:.1f} ms")
 
 if __name__ == "__main__":
-    monitor = WindowMonitor()
-    monitor.run()
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        search_main(sys.argv[2:])
+    else:
+        monitor = WindowMonitor()
+        monitor.run()
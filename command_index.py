@@ -0,0 +1,280 @@
+import re
+import time
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple, Dict, Any
+
+class CommandIndex:
+    """SQLite index linking logged commands to their screenshots and GIFs."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS commands (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            command TEXT NOT NULL,
+            window TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_commands_ts ON commands(ts);
+        CREATE INDEX IF NOT EXISTS idx_commands_command ON commands(command);
+
+        CREATE TABLE IF NOT EXISTS frames (
+            id INTEGER PRIMARY KEY,
+            command_id INTEGER REFERENCES commands(id),
+            ts REAL NOT NULL,
+            tag TEXT,
+            path TEXT NOT NULL UNIQUE
+        );
+        CREATE INDEX IF NOT EXISTS idx_frames_command ON frames(command_id);
+
+        CREATE TABLE IF NOT EXISTS gifs (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            path TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS gif_frames (
+            gif_id INTEGER NOT NULL REFERENCES gifs(id),
+            frame_path TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_gif_frames_path ON gif_frames(frame_path);
+    """
+
+    FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS commands_fts USING fts5(
+            command, content='commands', content_rowid='id', prefix='2 3'
+        );
+        CREATE TRIGGER IF NOT EXISTS commands_fts_insert AFTER INSERT ON commands BEGIN
+            INSERT INTO commands_fts(rowid, command) VALUES (new.id, new.command);
+        END;
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        # Events arrive from the keyboard hook, screenshot timers and GIF threads
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+        try:
+            fts_exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'commands_fts'"
+            ).fetchone()
+            self.conn.executescript(self.FTS_SCHEMA)
+            # Commands indexed while FTS5 was unavailable never went through the trigger
+            if not fts_exists and self.conn.execute("SELECT 1 FROM commands LIMIT 1").fetchone():
+                logging.info("Building full-text index over existing commands")
+                self.conn.execute("INSERT INTO commands_fts(commands_fts) VALUES('rebuild')")
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"SQLite FTS5 unavailable, falling back to LIKE search: {e}")
+            self.has_fts = False
+        self.conn.commit()
+
+        # Stored timestamps never decrease, so row ids stay in time order (see _id_bounds)
+        self.last_ts = self.conn.execute("SELECT MAX(ts) FROM commands").fetchone()[0] or 0.0
+
+    def add_command(self, command: str, window: Optional[str] = None,
+                    ts: Optional[float] = None) -> Optional[int]:
+        """Index a command and return its row id."""
+        try:
+            with self.lock, self.conn:
+                # A wall-clock step backwards (NTP, manual change) must not reorder ids
+                ts = max(ts if ts is not None else time.time(), self.last_ts)
+                cur = self.conn.execute(
+                    "INSERT INTO commands(ts, command, window) VALUES (?, ?, ?)",
+                    (ts, command, window)
+                )
+                self.last_ts = ts
+                return cur.lastrowid
+        except Exception as e:
+            logging.error(f"Error indexing command: {e}")
+            return None
+
+    def add_frame(self, path: str, tag: str = "", command_id: Optional[int] = None,
+                  ts: Optional[float] = None):
+        """Index a screenshot, optionally linked to the command that produced it."""
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO frames(command_id, ts, tag, path) VALUES (?, ?, ?, ?)",
+                    (command_id, ts if ts is not None else time.time(), tag, path)
+                )
+        except Exception as e:
+            logging.error(f"Error indexing screenshot: {e}")
+
+    def add_gif(self, path: str, frame_paths: List[str], ts: Optional[float] = None):
+        """Index a GIF together with the screenshots it was built from."""
+        try:
+            with self.lock, self.conn:
+                cur = self.conn.execute(
+                    "INSERT INTO gifs(ts, path) VALUES (?, ?)",
+                    (ts if ts is not None else time.time(), path)
+                )
+                self.conn.executemany(
+                    "INSERT INTO gif_frames(gif_id, frame_path) VALUES (?, ?)",
+                    [(cur.lastrowid, p) for p in frame_paths]
+                )
+        except Exception as e:
+            logging.error(f"Error indexing GIF: {e}")
+
+    @staticmethod
+    def _fts_query(text: str) -> str:
+        """Turn free text into an FTS5 query matching every term literally."""
+        terms = text.split()
+        return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    @staticmethod
+    def _is_tokenizable(term: str) -> bool:
+        """Whether FTS5 can index a term, i.e. it contains a letter or digit."""
+        return re.search(r"[^\W_]", term) is not None
+
+    @staticmethod
+    def _like_pattern(term: str) -> str:
+        """Substring LIKE pattern matching the term literally."""
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    @staticmethod
+    def _fts_prefix_query(prefix: str) -> Optional[str]:
+        """Turn a command prefix into an FTS5 initial-phrase query, or None if it has no tokens."""
+        # Same token characters as the unicode61 tokenizer (letters and digits)
+        tokens = re.findall(r"[^\W_]+", prefix)
+        if not tokens:
+            return None
+        # A trailing partial word is matched through the prefix indexes
+        star = "*" if re.search(r"[^\W_]$", prefix) else ""
+        return '^"' + " ".join(tokens) + '"' + star
+
+    @staticmethod
+    def _prefix_upper_bound(prefix: str) -> Optional[str]:
+        """Smallest string above every string starting with prefix, or None if there is none."""
+        chars = list(prefix)
+        while chars:
+            code = ord(chars.pop()) + 1
+            # Lone surrogates cannot be bound; the next valid code point is U+E000
+            if 0xD800 <= code <= 0xDFFF:
+                code = 0xE000
+            if code <= 0x10FFFF:
+                return "".join(chars) + chr(code)
+        return None
+
+    def _id_bounds(self, since: Optional[float], until: Optional[float]) -> Optional[Tuple[int, int]]:
+        """Map a time range onto a rowid range; ids follow insertion time. None if empty."""
+        low, high = 0, 2 ** 63 - 1
+        if since is not None:
+            row = self.conn.execute(
+                "SELECT id FROM commands WHERE ts >= ? ORDER BY ts LIMIT 1", (since,)
+            ).fetchone()
+            if row is None:
+                return None
+            low = row[0]
+        if until is not None:
+            row = self.conn.execute(
+                "SELECT id FROM commands WHERE ts < ? ORDER BY ts DESC LIMIT 1", (until,)
+            ).fetchone()
+            if row is None:
+                return None
+            high = row[0]
+        return (low, high) if low <= high else None
+
+    def search(self, text: Optional[str] = None, prefix: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """Search commands by text, command prefix and time range, newest first."""
+        matches = []
+        clauses = []
+        params: List[Any] = []
+
+        if text and text.split():
+            fts_terms = []
+            for term in text.split():
+                if self.has_fts and self._is_tokenizable(term):
+                    fts_terms.append(term)
+                else:
+                    # Punctuation such as "|" never reaches the FTS index; match it directly
+                    clauses.append("c.command LIKE ? ESCAPE '\\'")
+                    params.append(self._like_pattern(term))
+            if fts_terms:
+                matches.append(self._fts_query(" ".join(fts_terms)))
+
+        if prefix:
+            # Exact, case-sensitive check; the FTS phrase below only narrows candidates
+            clauses.append("c.command >= ?")
+            params.append(prefix)
+            upper = self._prefix_upper_bound(prefix)
+            if upper is not None:
+                clauses.append("c.command < ?")
+                params.append(upper)
+            else:
+                clauses.append("substr(c.command, 1, ?) = ?")
+                params.extend([len(prefix), prefix])
+            prefix_query = self._fts_prefix_query(prefix) if self.has_fts else None
+            if prefix_query:
+                matches.append(prefix_query)
+
+        if since is not None:
+            clauses.append("c.ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("c.ts < ?")
+            params.append(until)
+
+        with self.lock:
+            bounds = self._id_bounds(since, until)
+            if bounds is None:
+                return []
+
+            if matches:
+                # Drive the query from FTS5, which streams rowids newest first
+                source = "commands_fts f JOIN commands c ON c.id = f.rowid"
+                rowid = "f.rowid"
+                clauses[:0] = ["commands_fts MATCH ?"]
+                params[:0] = [" AND ".join(f"({m})" for m in matches)]
+            elif prefix:
+                # Range-scan the prefix instead of walking every rowid newest first
+                source = "commands c INDEXED BY idx_commands_command"
+                rowid = "c.id"
+            else:
+                source = "commands c"
+                rowid = "c.id"
+            clauses.append(f"{rowid} BETWEEN ? AND ?")
+            params.extend(bounds)
+            params.append(limit)
+
+            rows = self.conn.execute(
+                f"SELECT c.id, c.ts, c.command, c.window FROM {source} "
+                f"WHERE {' AND '.join(clauses)} ORDER BY {rowid} DESC LIMIT ?",
+                params
+            ).fetchall()
+
+            results = []
+            for command_id, ts, command, window in rows:
+                frames = self.conn.execute(
+                    "SELECT tag, path FROM frames WHERE command_id = ? ORDER BY ts",
+                    (command_id,)
+                ).fetchall()
+                gifs = self.conn.execute(
+                    "SELECT DISTINCT g.path FROM gifs g "
+                    "JOIN gif_frames gf ON gf.gif_id = g.id "
+                    "JOIN frames f ON f.path = gf.frame_path "
+                    "WHERE f.command_id = ? ORDER BY g.ts",
+                    (command_id,)
+                ).fetchall()
+                results.append({
+                    'id': command_id,
+                    'ts': ts,
+                    'command': command,
+                    'window': window,
+                    'frames': [{'tag': tag, 'path': path} for tag, path in frames],
+                    'gifs': [g[0] for g in gifs]
+                })
+        return results
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self.lock:
+            self.conn.close()
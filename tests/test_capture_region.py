@@ -0,0 +1,252 @@
+import logging
+
+import pytest
+
+try:
+    from PIL import Image, ImageDraw
+    import WinCap
+except (ImportError, SystemExit):
+    pytest.skip("capture dependencies not installed", allow_module_level=True)
+
+from command_index import CommandIndex
+
+WindowMonitor = WinCap.WindowMonitor
+
+WINDOW = (100, 100, 500, 400)
+CLIENT = (105, 130, 495, 395)
+
+
+def make_monitor(rect=WINDOW, client_rect=CLIENT, wm_class="XTerm", title="user@host: ~"):
+    monitor = WindowMonitor.__new__(WindowMonitor)
+    monitor.logger = logging.getLogger("test")
+    monitor.selected_window = {
+        'title': title,
+        'rect': rect,
+        'client_rect': client_rect,
+        'wm_class': wm_class,
+        'width': rect[2] - rect[0],
+        'height': rect[3] - rect[1],
+    }
+    monitor.target_rect = rect
+    monitor.capture_rect = None
+    monitor.roi_settings = {}
+    monitor.roi_auto = None
+    return monitor
+
+
+def terminal_frame(lines, size=(400, 300), first_row=40, width=60):
+    """Grayscale window with one short text-like bar per output line."""
+    img = Image.new('L', size, 0)
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        y = first_row + i * 15
+        draw.rectangle((10, y, 10 + width, y + 8), fill=255)
+    return img
+
+
+def test_validate_roi_settings_drops_malformed_entries():
+    monitor = make_monitor()
+    roi = {
+        'auto': {'mode': 'auto'},
+        'client': {'mode': 'client'},
+        'manual': {'mode': 'manual', 'rect': [0, 0, 10, 10]},
+        'string entry': 'auto',
+        'bad mode': {'mode': 'zoom'},
+        'no mode': {},
+        'manual without rect': {'mode': 'manual'},
+        'short rect': {'mode': 'manual', 'rect': [0, 0, 10]},
+        'string in rect': {'mode': 'manual', 'rect': [0, '0', 10, 10]},
+        'float in rect': {'mode': 'manual', 'rect': [0, 0, 10.5, 10]},
+        'bool in rect': {'mode': 'manual', 'rect': [False, 0, 10, True]},
+        'inverted rect': {'mode': 'manual', 'rect': [10, 0, 5, 10]},
+        'negative rect': {'mode': 'manual', 'rect': [-1, 0, 5, 10]},
+    }
+
+    assert monitor._validate_roi_settings(roi) == {
+        'auto': {'mode': 'auto'},
+        'client': {'mode': 'client'},
+        'manual': {'mode': 'manual', 'rect': [0, 0, 10, 10]},
+    }
+    assert monitor._validate_roi_settings(['auto']) == {}
+
+
+def test_manual_rect_is_relative_to_window():
+    monitor = make_monitor()
+    monitor.roi_settings = {'class:XTerm': {'mode': 'manual', 'rect': [10, 20, 110, 220]}}
+    monitor.apply_roi()
+    assert monitor.capture_rect == (110, 120, 210, 320)
+
+
+def test_manual_rect_is_clamped_to_window():
+    monitor = make_monitor()
+    monitor.roi_settings = {'class:XTerm': {'mode': 'manual', 'rect': [300, 200, 900, 900]}}
+    monitor.apply_roi()
+    assert monitor.capture_rect == (400, 300, 500, 400)
+
+
+def test_manual_rect_outside_window_falls_back_to_full_window():
+    monitor = make_monitor()
+    monitor.roi_settings = {'class:XTerm': {'mode': 'manual', 'rect': [600, 600, 700, 700]}}
+    monitor.apply_roi()
+    assert monitor.capture_rect == WINDOW
+
+
+def test_client_and_full_modes():
+    monitor = make_monitor()
+    monitor.roi_settings = {'class:XTerm': {'mode': 'client'}}
+    monitor.apply_roi()
+    assert monitor.capture_rect == CLIENT
+
+    monitor.roi_settings = {}
+    monitor.apply_roi()
+    assert monitor.capture_rect == WINDOW
+
+
+def test_exact_title_entry_wins_over_class_entry():
+    monitor = make_monitor()
+    monitor.roi_settings = {
+        'class:XTerm': {'mode': 'client'},
+        'user@host: ~': {'mode': 'full'},
+    }
+    monitor.apply_roi()
+    assert monitor.capture_rect == WINDOW
+
+    monitor.selected_window['title'] = "user@host: ~/src"
+    monitor.apply_roi()
+    assert monitor.capture_rect == CLIENT
+
+
+def test_configure_roi_saves_under_class_key(monkeypatch):
+    monitor = make_monitor()
+    monitor.roi_settings = {'user@host: ~': {'mode': 'full'}}
+    answers = iter(['client'])
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+
+    monitor.configure_roi()
+
+    assert monitor.roi_settings == {'class:XTerm': {'mode': 'client'}}
+
+
+def test_configure_roi_saves_under_title_without_class(monkeypatch):
+    monitor = make_monitor(wm_class=None)
+    answers = iter(['auto'])
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+
+    monitor.configure_roi()
+
+    assert monitor.roi_settings == {'user@host: ~': {'mode': 'auto'}}
+
+
+def test_configure_roi_blank_rect_returns_to_mode_prompt(monkeypatch):
+    monitor = make_monitor()
+    answers = iter(['manual', '1,2', '', 'manual', '0,0,50,60'])
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+
+    monitor.configure_roi()
+
+    assert monitor.roi_settings == {'class:XTerm': {'mode': 'manual', 'rect': [0, 0, 50, 60]}}
+    assert monitor.capture_rect == (100, 100, 150, 160)
+
+
+def start_auto(monitor):
+    monitor.roi_settings = {'class:XTerm': {'mode': 'auto'}}
+    monitor.apply_roi()
+
+
+def feed(monitor, img):
+    """Run one screenshot cycle; returns the rect the screenshot would use."""
+    rect = monitor._next_capture_rect()
+    if rect == monitor.target_rect:
+        monitor._update_auto_roi(img)
+    return rect
+
+
+def test_auto_learns_after_learn_frames():
+    monitor = make_monitor()
+    start_auto(monitor)
+
+    for i in range(WindowMonitor.ROI_LEARN_FRAMES - 1):
+        assert feed(monitor, terminal_frame(i + 1)) == WINDOW
+        assert monitor.roi_auto['learning']
+    assert feed(monitor, terminal_frame(WindowMonitor.ROI_LEARN_FRAMES)) == WINDOW
+
+    # Changed rows start at y=55; the region keeps full client width and reaches the bottom
+    top = WINDOW[1] + 55 - WindowMonitor.ROI_MARGIN
+    assert not monitor.roi_auto['learning']
+    assert monitor.capture_rect == (CLIENT[0], top, CLIENT[2], CLIENT[3])
+
+
+def test_auto_keeps_learning_until_something_changes():
+    monitor = make_monitor()
+    start_auto(monitor)
+
+    for _ in range(WindowMonitor.ROI_LEARN_FRAMES * 2):
+        assert feed(monitor, terminal_frame(1)) == WINDOW
+    assert monitor.roi_auto['learning']
+    assert monitor.capture_rect == WINDOW
+
+    feed(monitor, terminal_frame(2))
+    assert not monitor.roi_auto['learning']
+    assert monitor.capture_rect != WINDOW
+
+
+def test_auto_region_grows_on_recheck():
+    monitor = make_monitor()
+    start_auto(monitor)
+    for i in range(WindowMonitor.ROI_LEARN_FRAMES):
+        feed(monitor, terminal_frame(i + 1, first_row=150))
+    learned = monitor.capture_rect
+
+    # Screenshots between rechecks use the learned region and do not look at the frame
+    for _ in range(WindowMonitor.ROI_RECHECK_FRAMES):
+        assert feed(monitor, terminal_frame(0)) == learned
+
+    # The recheck grabs the whole window; output that appeared higher up moves the top edge
+    moved = terminal_frame(WindowMonitor.ROI_LEARN_FRAMES, first_row=150)
+    ImageDraw.Draw(moved).rectangle((10, 40, 300, 48), fill=255)
+    assert feed(monitor, moved) == WINDOW
+    assert monitor.capture_rect == (CLIENT[0], WINDOW[1] + 40 - WindowMonitor.ROI_MARGIN, CLIENT[2], CLIENT[3])
+    assert feed(monitor, moved) == monitor.capture_rect
+
+
+def test_auto_recheck_without_change_keeps_region():
+    monitor = make_monitor()
+    start_auto(monitor)
+    frame = None
+    for i in range(WindowMonitor.ROI_LEARN_FRAMES):
+        frame = terminal_frame(i + 1, first_row=150)
+        feed(monitor, frame)
+    learned = monitor.capture_rect
+
+    for _ in range(WindowMonitor.ROI_RECHECK_FRAMES):
+        feed(monitor, frame)
+    assert feed(monitor, terminal_frame(WindowMonitor.ROI_LEARN_FRAMES + 3, first_row=150)) == WINDOW
+    assert monitor.capture_rect == learned
+
+
+def test_make_gif_crops_to_latest_rect_and_skips_uncovered_frames(tmp_path):
+    monitor = make_monitor()
+    monitor.GIF_DIR = tmp_path
+    monitor.index = CommandIndex(tmp_path / "command_index.db")
+
+    region = (200, 150, 400, 300)
+    full = Image.new('RGB', (400, 300), 'red')
+    full.paste(Image.new('RGB', (200, 150), 'blue'), (100, 50))
+    full.save(tmp_path / "full.png")
+    Image.new('RGB', (200, 150), 'green').save(tmp_path / "region.png")
+    Image.new('RGB', (100, 100), 'white').save(tmp_path / "other.png")
+
+    paths = [str(tmp_path / name) for name in ("full.png", "other.png", "region.png")]
+    monitor.make_gif(paths, [WINDOW, (0, 0, 100, 100), region])
+
+    gif_path, = tmp_path.glob("*.gif")
+    gif = Image.open(gif_path)
+    assert gif.size == (200, 150)
+    assert gif.n_frames == 2
+    assert gif.convert('RGB').getpixel((0, 0)) == (0, 0, 255)
+    gif.seek(1)
+    assert gif.convert('RGB').getpixel((0, 0)) == (0, 128, 0)
+
+    linked = monitor.index.conn.execute("SELECT frame_path FROM gif_frames").fetchall()
+    assert [p for p, in linked] == [paths[0], paths[2]]
+    monitor.index.close()
@@ -0,0 +1,149 @@
+import pytest
+
+from command_index import CommandIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = CommandIndex(tmp_path / "command_index.db")
+    yield idx
+    idx.close()
+
+
+def commands(results):
+    return [r['command'] for r in results]
+
+
+def test_command_links_to_frames_and_gifs(index):
+    first = index.add_command("kubectl apply -f deploy.yaml", "term", ts=100.0)
+    second = index.add_command("ls", "term", ts=101.0)
+    index.add_frame("a_before_output.png", "_before_output", first, ts=100.1)
+    index.add_frame("a_after_output.png", "_after_output", first, ts=100.9)
+    index.add_frame("b_before_output.png", "_before_output", second, ts=101.1)
+    index.add_frame("c_manual.png", "_manual", ts=102.0)
+    index.add_gif("one.gif", ["a_before_output.png", "a_after_output.png"], ts=103.0)
+    index.add_gif("two.gif", ["a_after_output.png", "b_before_output.png", "c_manual.png"], ts=104.0)
+
+    result, = index.search(text="kubectl")
+    assert result['id'] == first
+    assert result['window'] == "term"
+    assert result['frames'] == [
+        {'tag': '_before_output', 'path': 'a_before_output.png'},
+        {'tag': '_after_output', 'path': 'a_after_output.png'},
+    ]
+    assert result['gifs'] == ["one.gif", "two.gif"]
+
+    result, = index.search(prefix="ls")
+    assert [f['path'] for f in result['frames']] == ["b_before_output.png"]
+    assert result['gifs'] == ["two.gif"]
+
+
+def test_results_are_newest_first_and_limited(index):
+    for i in range(5):
+        index.add_command(f"git commit -m {i}", ts=float(i))
+
+    assert commands(index.search(text="git", limit=2)) == ["git commit -m 4", "git commit -m 3"]
+
+
+def test_prefix_bounds(index):
+    for ts, command in enumerate(["git", "git push", "git pull", "gitk", "gjs", "gis", "Git push", "echo git push"]):
+        index.add_command(command, ts=float(ts))
+
+    assert commands(index.search(prefix="git")) == ["gitk", "git pull", "git push", "git"]
+    assert commands(index.search(prefix="git pu")) == ["git pull", "git push"]
+    assert commands(index.search(prefix="git push")) == ["git push"]
+    assert commands(index.search(prefix="gi")) == ["gis", "gitk", "git pull", "git push", "git"]
+    assert index.search(prefix="git push origin") == []
+
+
+def test_prefix_without_word_characters(index):
+    index.add_command("./run.sh", ts=1.0)
+    index.add_command("| tee out", ts=2.0)
+
+    assert commands(index.search(prefix="./")) == ["./run.sh"]
+    assert commands(index.search(prefix="|")) == ["| tee out"]
+
+
+def test_since_until_bounds(index):
+    for ts in range(10):
+        index.add_command(f"make {ts}", ts=float(ts))
+
+    assert commands(index.search(text="make", since=3.0, until=6.0)) == ["make 5", "make 4", "make 3"]
+    assert commands(index.search(since=8.0)) == ["make 9", "make 8"]
+    assert commands(index.search(until=2.0)) == ["make 1", "make 0"]
+    assert commands(index.search(prefix="make", since=2.5, until=3.5)) == ["make 3"]
+    assert index.search(since=10.0) == []
+    assert index.search(until=0.0) == []
+    assert index.search(since=5.0, until=5.0) == []
+
+
+def test_fts_query_quotes_terms():
+    assert CommandIndex._fts_query('kubectl apply') == '"kubectl" "apply"'
+    assert CommandIndex._fts_query('say "hi"') == '"say" """hi"""'
+    assert CommandIndex._fts_query('NOT OR*') == '"NOT" "OR*"'
+
+
+def test_text_search_with_punctuation_terms(index):
+    index.add_command("cat log | grep error", ts=1.0)
+    index.add_command("cat log", ts=2.0)
+    index.add_command("echo 100%", ts=3.0)
+    index.add_command("echo 100", ts=4.0)
+
+    assert commands(index.search(text="|")) == ["cat log | grep error"]
+    assert commands(index.search(text="cat |")) == ["cat log | grep error"]
+    assert commands(index.search(text="%")) == ["echo 100%"]
+    assert commands(index.search(text='say "hi" NOT OR*')) == []
+
+
+def test_fts_rebuilt_over_existing_commands(tmp_path):
+    db_path = tmp_path / "command_index.db"
+    idx = CommandIndex(db_path)
+    idx.add_command("kubectl apply", ts=1.0)
+    # Simulate an index written where FTS5 was unavailable
+    idx.conn.executescript("DROP TRIGGER commands_fts_insert; DROP TABLE commands_fts;")
+    idx.close()
+
+    idx = CommandIndex(db_path)
+    try:
+        assert commands(idx.search(text="kubectl")) == ["kubectl apply"]
+    finally:
+        idx.close()
+
+
+def test_since_until_with_clock_stepping_back(index):
+    index.add_command("a", ts=100.0)
+    index.add_command("b", ts=200.0)
+    index.add_command("c", ts=150.0)
+
+    assert commands(index.search(since=120.0)) == ["c", "b"]
+    assert commands(index.search(until=120.0)) == ["a"]
+    assert [r['ts'] for r in index.search()] == [200.0, 200.0, 100.0]
+
+
+def test_timestamps_stay_ordered_across_reopen(tmp_path):
+    db_path = tmp_path / "command_index.db"
+    idx = CommandIndex(db_path)
+    idx.add_command("a", ts=200.0)
+    idx.close()
+
+    idx = CommandIndex(db_path)
+    try:
+        idx.add_command("b", ts=100.0)
+        assert commands(idx.search(since=150.0)) == ["b", "a"]
+    finally:
+        idx.close()
+
+
+def test_prefix_ending_in_top_code_points(index):
+    index.add_command("echo \ud7ff", ts=1.0)
+    index.add_command("echo \ud7ffx", ts=2.0)
+    index.add_command("echo \ue000", ts=3.0)
+    index.add_command("echo \U0010ffff", ts=4.0)
+    index.add_command("\U0010ffff\U0010ffff!", ts=5.0)
+
+    assert commands(index.search(prefix="echo \ud7ff")) == ["echo \ud7ffx", "echo \ud7ff"]
+    assert commands(index.search(prefix="echo \U0010ffff")) == ["echo \U0010ffff"]
+    assert commands(index.search(prefix="\U0010ffff")) == ["\U0010ffff\U0010ffff!"]
+    assert CommandIndex._prefix_upper_bound("a\ud7ff") == "a\ue000"
+    assert CommandIndex._prefix_upper_bound("a\U0010ffff") == "b"
+    assert CommandIndex._prefix_upper_bound("\U0010ffff") is None